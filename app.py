@@ -1,22 +1,35 @@
 import os
+import re
+import gzip
+import time
+import base64
+import hashlib
+import mimetypes
 from functools import wraps
 import json # Import json for parsing features
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, send_file, send_from_directory
 from flask_bcrypt import Bcrypt
 import mysql.connector
 import html # optional for sanitization
 
-from weasyprint import HTML, CSS
-from docx import Document
+from weasyprint import HTML, CSS, __version__ as WEASYPRINT_VERSION
+from docx import Document, __version__ as DOCX_VERSION
 from docx.shared import Pt, RGBColor
 from bs4 import BeautifulSoup
 import io
+from reportlab import Version as REPORTLAB_VERSION
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
 from datetime import datetime, timedelta
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import logging
+from artifact_store import artifact_key, create_artifact_store_from_env, write_atomic
+
+try:
+    import brotli  # optional; enables .br precompressed static assets
+except ImportError:
+    brotli = None
 
 # Configure WeasyPrint logging for more verbosity
 logging.getLogger('weasyprint').setLevel(logging.DEBUG)
@@ -33,6 +46,28 @@ if WEASYPRINT_DLL_DIRECTORIES == [""]:
     WEASYPRINT_DLL_DIRECTORIES = []
 os.environ["PATH"] += os.pathsep + os.pathsep.join(WEASYPRINT_DLL_DIRECTORIES)
 
+# Generated exports live in a shared artifact store (local dir/NFS or S3) so
+# every worker and node can reuse them. Local artifacts can be handed off to the
+# front-end server instead of being streamed by Python:
+#   USE_X_SENDFILE=1            -> X-Sendfile header (Apache mod_xsendfile, lighttpd)
+#   ARTIFACT_ACCEL_PREFIX=/_a/  -> X-Accel-Redirect for nginx; map it to the store
+#                                  root with `location /_a/ { internal; alias <ARTIFACT_DIR>/; }`
+# Run `flask prune-artifacts` from cron to delete artifacts older than ARTIFACT_TTL_DAYS.
+artifact_store = create_artifact_store_from_env()
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+ARTIFACT_ACCEL_PREFIX = os.getenv("ARTIFACT_ACCEL_PREFIX", "")
+ARTIFACT_TTL_DAYS = float(os.getenv("ARTIFACT_TTL_DAYS", "7"))
+# Part of every export key so a deploy that changes rendering (our code or the
+# libraries) doesn't keep serving files built by the old renderer. Bump
+# EXPORT_RENDER_VERSION whenever export_document's output changes.
+EXPORT_RENDER_VERSION = "2"
+EXPORT_RENDER_SALT = "|".join([
+    EXPORT_RENDER_VERSION,
+    f"weasyprint-{WEASYPRINT_VERSION}",
+    f"reportlab-{REPORTLAB_VERSION}",
+    f"python-docx-{DOCX_VERSION}",
+])
+
 # Placeholder for payment gateway API keys (e.g., Flutterwave, IntaSend)
 API_KEYS = {
     "FLUTTERWAVE_PUBLIC": os.getenv("FLUTTERWAVE_PUBLIC_KEY"),
@@ -96,6 +131,151 @@ def close_db_conn(exc):
         except:
             pass
 
+# --------- Static assets ----------
+# style.css / script.js are minified, fingerprinted with a content hash and
+# precompressed into static/dist/ so they can be cached forever by browsers.
+# Templates should use asset_url('style.css') instead of url_for('static', ...).
+ASSET_SOURCES = ["style.css", "script.js"]
+ASSET_DIST_DIR = "dist"
+ASSET_CACHE_MAX_AGE = 31536000  # one year; safe because names change with content
+COMPRESS_MIN_SIZE = 500  # bytes; smaller HTML/JSON bodies aren't worth gzipping
+COMPRESSIBLE_MIMETYPES = {"text/html", "application/json"}
+
+# Quoted strings and url(...) tokens are copied verbatim; comments are dropped
+_CSS_TOKEN_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\)|/\*.*?\*/)""", re.S)
+
+def _minify_css_chunk(chunk):
+    chunk = re.sub(r"\s+", " ", chunk)
+    chunk = re.sub(r"\s*([{};,>])\s*", r"\1", chunk)
+    chunk = re.sub(r":\s+", ":", chunk)
+    return chunk.replace(";}", "}")
+
+def minify_css(source):
+    out = []
+    pending = ""
+    for i, token in enumerate(_CSS_TOKEN_RE.split(source)):
+        if i % 2 == 0:
+            pending += token
+        elif token.startswith("/*"):
+            pending += " "
+        else:
+            out.append(_minify_css_chunk(pending))
+            out.append(token)
+            pending = ""
+    out.append(_minify_css_chunk(pending))
+    return "".join(out).strip()
+
+def minify_js(source):
+    # Conservative: drop comment-only lines, indentation and blank lines but keep
+    # line breaks so automatic semicolon insertion behaves exactly as before.
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def build_assets(static_folder=None):
+    """Minify, fingerprint and precompress ASSET_SOURCES; returns {name: dist path}."""
+    static_folder = static_folder or app.static_folder
+    dist_dir = os.path.join(static_folder, ASSET_DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for name in ASSET_SOURCES:
+        src_path = os.path.join(static_folder, name)
+        if not os.path.exists(src_path):
+            continue
+        with open(src_path, encoding="utf-8") as fh:
+            source = fh.read()
+        stem, ext = os.path.splitext(name)
+        minified = (minify_css(source) if ext == ".css" else minify_js(source)).encode("utf-8")
+        digest = hashlib.sha256(minified).hexdigest()[:12]
+        hashed_name = f"{stem}.{digest}{ext}"
+        out_path = os.path.join(dist_dir, hashed_name)
+        # Each variant is checked on its own so e.g. installing Brotli later
+        # still adds .br files next to assets that were already built
+        if not os.path.exists(out_path + ".gz"):
+            write_atomic(out_path + ".gz", gzip.compress(minified, compresslevel=9, mtime=0))
+        if brotli is not None and not os.path.exists(out_path + ".br"):
+            write_atomic(out_path + ".br", brotli.compress(minified, quality=11))
+        if not os.path.exists(out_path):
+            write_atomic(out_path, minified)
+        manifest[name] = f"{ASSET_DIST_DIR}/{hashed_name}"
+    return manifest
+
+def remove_stale_assets(manifest, static_folder=None):
+    """Delete dist files (and their .gz/.br variants) not in manifest; returns the count."""
+    static_folder = static_folder or app.static_folder
+    dist_dir = os.path.join(static_folder, ASSET_DIST_DIR)
+    current = {os.path.basename(path) for path in manifest.values()}
+    removed = 0
+    for name in os.listdir(dist_dir):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if base not in current:
+            os.unlink(os.path.join(dist_dir, name))
+            removed += 1
+    return removed
+
+try:
+    ASSET_MANIFEST = build_assets()
+except OSError:
+    # e.g. a read-only static folder in a container image; serve unhashed files
+    logging.exception("Static asset build failed; serving unbuilt assets")
+    ASSET_MANIFEST = {}
+
+@app.template_global()
+def asset_url(filename):
+    # Fall back to the unhashed file so a missing build never breaks a page
+    return url_for('static', filename=ASSET_MANIFEST.get(filename, filename))
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Build fingerprinted and precompressed static assets."""
+    manifest = build_assets()
+    for name, path in manifest.items():
+        print(f"{name} -> {path}")
+    # Old digests are left in place at startup (other workers may still be
+    # serving pages that reference them); clean them up on an explicit build.
+    print(f"Removed {remove_stale_assets(manifest)} stale files")
+
+@app.route('/static/dist/<path:filename>')
+def static_dist(filename):
+    # Serve the precompressed variant the client accepts; files are immutable.
+    dist_dir = os.path.join(app.static_folder, ASSET_DIST_DIR)
+    encoding = None
+    for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[candidate] > 0 and os.path.exists(os.path.join(dist_dir, filename + suffix)):
+            encoding = candidate
+            break
+    mimetype = mimetypes.guess_type(filename)[0]
+    if encoding:
+        response = send_from_directory(dist_dir, filename + (".br" if encoding == "br" else ".gz"),
+                                       mimetype=mimetype, max_age=ASSET_CACHE_MAX_AGE)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype, max_age=ASSET_CACHE_MAX_AGE)
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_CACHE_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.after_request
+def compress_response(response):
+    # gzip dynamic HTML/JSON; files (send_file) are streamed and left alone
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or "Content-Encoding" in response.headers
+            or request.accept_encodings["gzip"] <= 0):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
 # --------- Helpers ----------
 def login_required(f):
     @wraps(f)
@@ -105,6 +285,146 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def send_artifact(key, download_name, mimetype):
+    # Hand off to nginx/X-Sendfile, else stream an already opened handle (a local
+    # file still goes out via sendfile). Raises here, not mid-response, if the
+    # artifact is gone, so callers can open it before charging credits.
+    relative_path = artifact_store.relative_path(key)
+    if ARTIFACT_ACCEL_PREFIX and relative_path:
+        if not artifact_store.exists(key):
+            raise FileNotFoundError(key)
+        response = app.response_class(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = ARTIFACT_ACCEL_PREFIX.rstrip("/") + "/" + relative_path
+        response.headers.set("Content-Disposition", "attachment", filename=download_name)
+        return response
+    path = artifact_store.local_path(key)
+    if path and app.config["USE_X_SENDFILE"]:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        source = path
+    else:
+        source = artifact_store.open(key)
+    return send_file(source, as_attachment=True, download_name=download_name, mimetype=mimetype)
+
+# --------- PDF optimization ----------
+# Per-plan WeasyPrint size settings. Images above `dpi` are downsampled. WeasyPrint
+# only re-encodes JPEG sources at `jpeg_quality` (PNGs stay lossless), so large
+# opaque PNG data URIs - pasted screenshots - are converted to JPEG at that
+# quality before rendering. Images linked by URL are left as they are. Fonts
+# are always subset.
+PDF_OPTIMIZATION_PROFILES = {
+    "free": {"dpi": 150, "jpeg_quality": 70},
+    "one_time_document": {"dpi": 200, "jpeg_quality": 80},
+    "monthly_subscription": {"dpi": 300, "jpeg_quality": 90},
+}
+DEFAULT_PDF_PROFILE = {"dpi": 150, "jpeg_quality": 75}
+# Set PDF_OPTIMIZE_COMPARE=1 to also render an unoptimized copy and log the
+# before/after size (doubles render cost, so keep it off in production).
+PDF_OPTIMIZE_COMPARE = os.getenv("PDF_OPTIMIZE_COMPARE", "0") == "1"
+PDF_PAGE_CSS = CSS(string='@page { size: A4; margin: 1in }')
+PNG_TO_JPEG_MIN_BYTES = 100 * 1024  # smaller PNGs (icons, diagrams) stay lossless
+_PNG_DATA_URI_RE = re.compile(r"^data:image/png;base64,(.+)$", re.S)
+# Child of app.logger so it goes through Flask's default handler; INFO so the
+# size/time lines aren't dropped by the root logger's WARNING level
+pdf_logger = app.logger.getChild("pdf")
+pdf_logger.setLevel(logging.INFO)
+
+_watermark_data_uri = None
+
+def get_pdf_profile(plan_type):
+    return PDF_OPTIMIZATION_PROFILES.get(plan_type, DEFAULT_PDF_PROFILE)
+
+def watermark_data_uri():
+    """Rotated watermark text as a PNG data URI, built once per process."""
+    global _watermark_data_uri
+    if _watermark_data_uri is None:
+        # Pillow is already a WeasyPrint dependency; >= 10.1 for a scalable default font
+        from PIL import Image, ImageDraw, ImageFont
+        text = "Assignment Formatter - Watermark"
+        font = ImageFont.load_default(size=64)
+        left, top, right, bottom = ImageDraw.Draw(Image.new("LA", (1, 1))).textbbox((0, 0), text, font=font)
+        img = Image.new("LA", (right - left + 20, bottom - top + 20), (0, 0))
+        ImageDraw.Draw(img).text((10 - left, 10 - top), text, font=font, fill=(0, 26))  # ~10% opacity black
+        img = img.rotate(45, expand=True, resample=Image.BICUBIC)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+        _watermark_data_uri = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+    return _watermark_data_uri
+
+def png_data_uri_to_jpeg(uri, quality):
+    """JPEG data URI for a large opaque PNG data URI, or None to keep the original."""
+    from PIL import Image
+    match = _PNG_DATA_URI_RE.match(uri)
+    if not match:
+        return None
+    try:
+        png_bytes = base64.b64decode(match.group(1))
+    except ValueError:
+        return None
+    if len(png_bytes) < PNG_TO_JPEG_MIN_BYTES:
+        return None
+    try:
+        img = Image.open(io.BytesIO(png_bytes))
+        img.load()
+    except Exception:
+        return None  # let WeasyPrint deal with (or report) broken images
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        alpha = img.convert("RGBA").getchannel("A")
+        if alpha.getextrema() != (255, 255):
+            return None  # JPEG has no transparency
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=quality, optimize=True)
+    if buf.tell() >= len(png_bytes):
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+def prepare_pdf_html(full_html, profile, watermarked):
+    """Recompress pasted PNGs (unless profile is None) and add the watermark on top of each page."""
+    soup = BeautifulSoup(full_html, 'html.parser')
+    for img in (soup.find_all('img', src=True) if profile else []):
+        jpeg_uri = png_data_uri_to_jpeg(img['src'], profile["jpeg_quality"])
+        if jpeg_uri:
+            img['src'] = jpeg_uri
+    if watermarked and soup.body:
+        # position: fixed repeats it on every page above the content; the same
+        # image is embedded once and referenced from each page
+        mark = soup.new_tag('img', src=watermark_data_uri(), alt="")
+        mark['class'] = 'watermark'
+        soup.body.append(mark)
+    return str(soup)
+
+def render_pdf(full_html, plan_type, watermarked=False):
+    profile = get_pdf_profile(plan_type)
+    start = time.perf_counter()
+    pdf_html = prepare_pdf_html(full_html, profile, watermarked)
+    # Image options are applied while images load, i.e. during render()
+    document = HTML(string=pdf_html).render(
+        stylesheets=[PDF_PAGE_CSS],
+        optimize_images=True,
+        dpi=profile["dpi"],
+        jpeg_quality=profile["jpeg_quality"],
+    )
+    pdf_bytes = document.write_pdf(
+        full_fonts=False,  # subset embedded fonts
+        hinting=False,
+        uncompressed_pdf=False,
+    )
+    render_ms = (time.perf_counter() - start) * 1000
+    if PDF_OPTIMIZE_COMPARE:
+        baseline_html = prepare_pdf_html(full_html, None, watermarked)
+        baseline_size = len(HTML(string=baseline_html).write_pdf(stylesheets=[PDF_PAGE_CSS]))
+        pdf_logger.info("PDF optimized (%s): %d -> %d bytes in %.0f ms",
+                        plan_type, baseline_size, len(pdf_bytes), render_ms)
+    else:
+        pdf_logger.info("PDF optimized (%s): %d bytes in %.0f ms", plan_type, len(pdf_bytes), render_ms)
+    return pdf_bytes
+
+@app.cli.command("prune-artifacts")
+def prune_artifacts_command():
+    """Delete stored exports older than ARTIFACT_TTL_DAYS."""
+    removed = artifact_store.prune(ARTIFACT_TTL_DAYS * 86400)
+    print(f"Removed {removed} artifacts older than {ARTIFACT_TTL_DAYS:g} days")
+
 # Simple heading detection (Stage 1) - Re-added
 def detect_sections(text):
     lines = [l.strip() for l in text.splitlines() if l.strip() != ""]
@@ -389,18 +709,15 @@ def export_document(doc_id):
     
     watermark_style = ""
     if user_plan_info['is_watermarked_export']:
+        # The watermark image itself is only added on the PDF path (render_pdf)
         watermark_style = """
-          body::after {
-            content: "Assignment Formatter - Watermark";
+          img.watermark {
             position: fixed;
             top: 50%;
             left: 50%;
-            transform: translate(-50%, -50%) rotate(-45deg);
-            font-size: 3em;
-            color: rgba(0, 0, 0, 0.1);
+            width: 80%;
+            transform: translate(-50%, -50%);
             z-index: 9999;
-            pointer-events: none;
-            white-space: nowrap;
           }
         """
         print(f"DEBUG: Watermark enabled: {user_plan_info['is_watermarked_export']}") # Debug print
@@ -424,30 +741,43 @@ def export_document(doc_id):
 
     try:
         if typ == 'pdf':
-            print("DEBUG: Attempting PDF generation.") # Debug print
-            try:
-                pdf_bytes = HTML(string=full_html).write_pdf(stylesheets=[CSS(string='@page { size: A4; margin: 1in }')])
-                print("DEBUG: PDF generated by WeasyPrint.")
-            except Exception as wp_err:
-                # Log WeasyPrint error and attempt a simple ReportLab fallback
-                print(f"WARNING: WeasyPrint PDF generation failed: {wp_err}")
-                print("DEBUG: Falling back to ReportLab for a simple PDF.")
-                buf = io.BytesIO()
-                c = canvas.Canvas(buf, pagesize=A4)
-                width, height = A4
-                # Basic rendering: write plain text paragraphs
-                y = height - inch
-                text_obj = c.beginText(inch, y)
-                text_obj.setFont('Times-Roman', 12)
-                for line in BeautifulSoup(html_content, 'html.parser').get_text(separator='\n').splitlines():
-                    text_obj.textLine(line)
-                c.drawText(text_obj)
-                c.showPage()
-                c.save()
-                buf.seek(0)
-                pdf_bytes = buf.read()
-                print("DEBUG: PDF generated by ReportLab fallback.")
-            
+            pdf_profile = get_pdf_profile(user_plan_info['plan_type'])
+            pdf_key = artifact_key('pdf', EXPORT_RENDER_SALT, json.dumps(pdf_profile, sort_keys=True), full_html, ext='.pdf')
+            if artifact_store.exists(pdf_key):
+                print("DEBUG: Reusing stored PDF artifact.") # Debug print
+            else:
+                print("DEBUG: Attempting PDF generation.") # Debug print
+                try:
+                    pdf_bytes = render_pdf(full_html, user_plan_info['plan_type'],
+                                           watermarked=bool(user_plan_info['is_watermarked_export']))
+                    print("DEBUG: PDF generated by WeasyPrint.")
+                except Exception as wp_err:
+                    # Log WeasyPrint error and attempt a simple ReportLab fallback
+                    print(f"WARNING: WeasyPrint PDF generation failed: {wp_err}")
+                    print("DEBUG: Falling back to ReportLab for a simple PDF.")
+                    # Store the fallback separately so the next export retries WeasyPrint
+                    pdf_key = artifact_key('pdf-fallback', EXPORT_RENDER_SALT, full_html, ext='.pdf')
+                    buf = io.BytesIO()
+                    c = canvas.Canvas(buf, pagesize=A4)
+                    width, height = A4
+                    # Basic rendering: write plain text paragraphs
+                    y = height - inch
+                    text_obj = c.beginText(inch, y)
+                    text_obj.setFont('Times-Roman', 12)
+                    for line in BeautifulSoup(html_content, 'html.parser').get_text(separator='\n').splitlines():
+                        text_obj.textLine(line)
+                    c.drawText(text_obj)
+                    c.showPage()
+                    c.save()
+                    buf.seek(0)
+                    pdf_bytes = buf.read()
+                    print("DEBUG: PDF generated by ReportLab fallback.")
+                artifact_store.put(pdf_key, pdf_bytes)
+
+            # Open the artifact before touching credits: once they're charged
+            # (autocommit) a failure here could not be rolled back.
+            response = send_artifact(pdf_key, download_name=f"assignment_{doc_id}.pdf", mimetype='application/pdf')
+
             # Decrement credits or update daily count AFTER successful export
             if user_plan_info['plan_type'] == 'one_time_document':
                 cur = get_db_cursor()
@@ -469,45 +799,55 @@ def export_document(doc_id):
             cur.close()
             print("DEBUG: Document status updated to exported.") # Debug print
 
-            return send_file(io.BytesIO(pdf_bytes), as_attachment=True, download_name=f"assignment_{doc_id}.pdf", mimetype='application/pdf')
+            return response
 
         elif typ == 'docx':
-            print("DEBUG: Attempting DOCX generation.") # Debug print
-            # Parse HTML and construct .docx
-            soup = BeautifulSoup(html_content, 'html.parser')
-            docx = Document()
-            # Set default style font (python-docx has limitations on full style control, but set Normal)
-            style = docx.styles['Normal']
-            style.font.name = 'Times New Roman'
-            style.font.size = Pt(12)
-
-            # Apply watermark if needed (python-docx doesn't directly support background watermarks like CSS)
-            # For DOCX, a watermark would typically be added as a header/footer image or a Shape.
-            # This is a simplification. A real implementation would involve more complex docx manipulation.
-            if user_plan_info['is_watermarked_export']:
-                # Placeholder for DOCX watermark: add a paragraph with light grey text
-                header = docx.sections[0].header
-                paragraph = header.paragraphs[0]
-                run = paragraph.add_run("Assignment Formatter - Watermark")
-                run.font.color.rgb = RGBColor(192, 192, 192) # Light grey
-                run.font.size = Pt(24)
-                print("DEBUG: DOCX watermark applied.") # Debug print
-
-            # Convert headings and paragraphs
-            for elem in soup.find_all(['h1','h2','h3','p','ul','ol']):
-                if elem.name in ['h1','h2','h3']:
-                    level = 1 if elem.name=='h1' else (2 if elem.name=='h2' else 3)
-                    docx.add_heading(elem.get_text(), level=level)
-                elif elem.name == 'p':
-                    p = docx.add_paragraph(elem.get_text())
-                elif elem.name in ['ul','ol']:
-                    for li in elem.find_all('li'):
-                        p = docx.add_paragraph(li.get_text(), style='List Bullet' if elem.name=='ul' else 'List Number')
-
-            f = io.BytesIO()
-            docx.save(f)
-            f.seek(0)
-            print("DEBUG: DOCX generated.") # Debug print
+            watermark_flag = '1' if user_plan_info['is_watermarked_export'] else '0'
+            docx_key = artifact_key('docx', EXPORT_RENDER_SALT, watermark_flag, html_content, ext='.docx')
+            if artifact_store.exists(docx_key):
+                print("DEBUG: Reusing stored DOCX artifact.") # Debug print
+            else:
+                print("DEBUG: Attempting DOCX generation.") # Debug print
+                # Parse HTML and construct .docx
+                soup = BeautifulSoup(html_content, 'html.parser')
+                docx = Document()
+                # Set default style font (python-docx has limitations on full style control, but set Normal)
+                style = docx.styles['Normal']
+                style.font.name = 'Times New Roman'
+                style.font.size = Pt(12)
+
+                # Apply watermark if needed (python-docx doesn't directly support background watermarks like CSS)
+                # For DOCX, a watermark would typically be added as a header/footer image or a Shape.
+                # This is a simplification. A real implementation would involve more complex docx manipulation.
+                if user_plan_info['is_watermarked_export']:
+                    # Placeholder for DOCX watermark: add a paragraph with light grey text
+                    header = docx.sections[0].header
+                    paragraph = header.paragraphs[0]
+                    run = paragraph.add_run("Assignment Formatter - Watermark")
+                    run.font.color.rgb = RGBColor(192, 192, 192) # Light grey
+                    run.font.size = Pt(24)
+                    print("DEBUG: DOCX watermark applied.") # Debug print
+
+                # Convert headings and paragraphs
+                for elem in soup.find_all(['h1','h2','h3','p','ul','ol']):
+                    if elem.name in ['h1','h2','h3']:
+                        level = 1 if elem.name=='h1' else (2 if elem.name=='h2' else 3)
+                        docx.add_heading(elem.get_text(), level=level)
+                    elif elem.name == 'p':
+                        p = docx.add_paragraph(elem.get_text())
+                    elif elem.name in ['ul','ol']:
+                        for li in elem.find_all('li'):
+                            p = docx.add_paragraph(li.get_text(), style='List Bullet' if elem.name=='ul' else 'List Number')
+
+                f = io.BytesIO()
+                docx.save(f)
+                f.seek(0)
+                artifact_store.put(docx_key, f)
+                print("DEBUG: DOCX generated.") # Debug print
+
+            # Open the artifact before touching credits: once they're charged
+            # (autocommit) a failure here could not be rolled back.
+            response = send_artifact(docx_key, download_name=f"assignment_{doc_id}.docx", mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
 
             # Decrement credits or update daily count AFTER successful export
             if user_plan_info['plan_type'] == 'one_time_document':
@@ -530,7 +870,7 @@ def export_document(doc_id):
             cur.close()
             print("DEBUG: Document status updated to exported.") # Debug print
 
-            return send_file(f, as_attachment=True, download_name=f"assignment_{doc_id}.docx", mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+            return response
         else:
             print(f"DEBUG: Unsupported export type: {typ}") # Debug print
             return "Unsupported export type", 400
@@ -0,0 +1,190 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from abc import ABC, abstractmethod
+
+try:
+    import boto3  # optional; only needed for the S3 backend
+except ImportError:
+    boto3 = None
+
+
+
+def write_atomic(path, data):
+    """Write bytes or a binary file object to path so readers never see a partial file.
+
+    The temp file lives in the target directory (same filesystem, so the rename
+    is atomic) and is created with open(), so it gets the usual umask-based mode.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".tmp-{name}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    try:
+        with open(tmp_path, "xb") as fh:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                fh.write(data)
+            else:
+                shutil.copyfileobj(data, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def artifact_key(*parts, ext=""):
+    """Content-hash key for an artifact built from the given inputs."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part)
+        h.update(b"\0")  # separator so ("ab", "c") != ("a", "bc")
+    return h.hexdigest() + ext
+
+
+class ArtifactStore(ABC):
+    """Interface for storing generated export files shared by all workers/nodes.
+
+    Keys are content hashes, so an object never changes once written and any
+    worker can reuse what another one rendered. Nothing is evicted on its own:
+    run prune() periodically (see `flask prune-artifacts`) to bound storage.
+    """
+
+    @abstractmethod
+    def exists(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key, data):
+        """Store bytes or a binary file object under key. Must be atomic."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def open(self, key):
+        """Return a readable binary file object for key."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def prune(self, max_age_seconds):
+        """Delete artifacts written more than max_age_seconds ago; returns the count."""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path for key if the backend has one (enables sendfile)."""
+        return None
+
+    def relative_path(self, key):
+        """Path of key relative to the store root (for X-Accel-Redirect)."""
+        return None
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Local directory backend; point it at an NFS mount to share across hosts."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, self.relative_path(key))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+
+    def open(self, key):
+        return open(self._path(key), "rb")
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def relative_path(self, key):
+        # Shard by the first two hex chars to keep directories small
+        return f"{key[:2]}/{key}"
+
+    def prune(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # removed concurrently by another node
+        return removed
+
+
+class S3ArtifactStore(ArtifactStore):
+    """S3-compatible backend. Set endpoint_url to use MinIO or another stand-in."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("boto3 is required for the S3 artifact store")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object_key(self, key):
+        return f"{self.prefix}{key}"
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key, data):
+        # A PUT only becomes visible once the upload completes, so it is atomic
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=bytes(data))
+        else:
+            self.client.upload_fileobj(data, self.bucket, self._object_key(key))
+
+    def open(self, key):
+        # Streaming body; content is read in chunks while the response is sent
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+
+    def prune(self, max_age_seconds):
+        # A bucket lifecycle expiration rule on the prefix does the same job
+        # without a cron; this is for stand-ins that lack lifecycle support.
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            stale = [{"Key": obj["Key"]} for obj in page.get("Contents", [])
+                     if obj["LastModified"].timestamp() < cutoff]
+            if stale:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": stale, "Quiet": True})
+                removed += len(stale)
+        return removed
+
+
+def create_artifact_store_from_env():
+    backend = os.getenv("ARTIFACT_STORE", "local").lower()
+    if backend == "s3":
+        return S3ArtifactStore(
+            bucket=os.environ["ARTIFACT_S3_BUCKET"],
+            prefix=os.getenv("ARTIFACT_S3_PREFIX", "exports/"),
+            endpoint_url=os.getenv("ARTIFACT_S3_ENDPOINT") or None,
+        )
+    if backend == "local":
+        return LocalArtifactStore(os.getenv("ARTIFACT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts")))
+    raise ValueError(f"Unknown ARTIFACT_STORE backend: {backend}")
@@ -0,0 +1,152 @@
+import io
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from artifact_store import ArtifactStore, LocalArtifactStore, S3ArtifactStore, artifact_key, write_atomic
+
+
+# --------- artifact_key ----------
+def test_artifact_key_separates_parts():
+    assert artifact_key("ab", "c") != artifact_key("a", "bc")
+    assert artifact_key("a", "b") == artifact_key(b"a", b"b")
+
+
+def test_artifact_key_appends_extension():
+    key = artifact_key("pdf", "x", ext=".pdf")
+    assert key.endswith(".pdf")
+    assert len(key) == 64 + len(".pdf")
+
+
+# --------- write_atomic ----------
+def test_write_atomic_respects_umask_and_leaves_no_temp_files(tmp_path):
+    path = tmp_path / "out.bin"
+    write_atomic(str(path), b"data")
+    umask = os.umask(0)
+    os.umask(umask)
+    assert path.read_bytes() == b"data"
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_write_atomic_cleans_up_on_error(tmp_path):
+    class Broken(io.RawIOBase):
+        def readinto(self, b):
+            raise OSError("boom")
+
+    with pytest.raises(OSError):
+        write_atomic(str(tmp_path / "out.bin"), Broken())
+    assert os.listdir(tmp_path) == []
+
+
+# --------- LocalArtifactStore ----------
+def test_local_put_exists_open(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    key = artifact_key("doc", ext=".pdf")
+    assert not store.exists(key)
+    store.put(key, b"%PDF-1.7")
+    assert store.exists(key)
+    with store.open(key) as fh:
+        assert fh.read() == b"%PDF-1.7"
+    assert store.local_path(key) == os.path.join(str(tmp_path), store.relative_path(key))
+
+
+def test_local_put_from_file_object(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    store.put("abc.docx", io.BytesIO(b"docx bytes"))
+    with store.open("abc.docx") as fh:
+        assert fh.read() == b"docx bytes"
+
+
+def test_local_root_is_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = LocalArtifactStore("artifacts")
+    assert store.root == os.path.join(str(tmp_path), "artifacts")
+
+
+def test_local_prune_removes_only_old_files(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    store.put("aaold", b"old")
+    store.put("bbnew", b"new")
+    old_time = time.time() - 3600
+    os.utime(store.local_path("aaold"), (old_time, old_time))
+    assert store.prune(60) == 1
+    assert not store.exists("aaold")
+    assert store.exists("bbnew")
+
+
+def test_backend_missing_methods_fails_on_creation():
+    class Incomplete(ArtifactStore):
+        def exists(self, key):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+# --------- S3ArtifactStore (stub client) ----------
+class FakeClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    class exceptions:
+        ClientError = FakeClientError
+
+    def __init__(self, objects=None, head_error=None, page_size=2):
+        self.objects = objects or {}
+        self.head_error = head_error
+        self.page_size = page_size
+        self.delete_calls = []
+
+    def head_object(self, Bucket, Key):
+        if self.head_error:
+            raise FakeClientError(self.head_error)
+        if Key not in self.objects:
+            raise FakeClientError("404")
+        return {}
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        for i in range(0, len(keys), self.page_size):
+            yield {"Contents": [{"Key": k, "LastModified": self.objects[k]}
+                                for k in keys[i:i + self.page_size]]}
+
+    def delete_objects(self, Bucket, Delete):
+        self.delete_calls.append([obj["Key"] for obj in Delete["Objects"]])
+        for obj in Delete["Objects"]:
+            del self.objects[obj["Key"]]
+
+
+def test_s3_exists_maps_404_to_false():
+    client = FakeS3Client(objects={"exports/present": None})
+    store = S3ArtifactStore("bucket", prefix="exports/", client=client)
+    assert store.exists("present")
+    assert not store.exists("missing")
+
+
+def test_s3_exists_reraises_other_errors():
+    store = S3ArtifactStore("bucket", prefix="exports/", client=FakeS3Client(head_error="AccessDenied"))
+    with pytest.raises(FakeClientError):
+        store.exists("anything")
+
+
+def test_s3_prune_deletes_stale_objects_per_page():
+    old = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    new = datetime.now(timezone.utc)
+    client = FakeS3Client(objects={
+        "exports/a": old, "exports/b": old, "exports/c": new,
+        "exports/d": old, "other/e": old,
+    })
+    store = S3ArtifactStore("bucket", prefix="exports/", client=client)
+    assert store.prune(60) == 3
+    assert client.delete_calls == [["exports/a", "exports/b"], ["exports/d"]]
+    assert sorted(client.objects) == ["exports/c", "other/e"]